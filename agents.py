@@ -7,6 +7,9 @@ from tools.developer_tool import developer_tool
 from utils.llm_client import llm_complete
 
 # Define agents
+# NOTE: agent reasoning calls go through crewai's own client for LLM_MODEL, not
+# utils.llm_client.llm_complete, so they bypass the priority scheduler and its
+# RPM/TPM budgets. Only the tools' completions (planner/developer) are scheduled.
 retriever_agent = Agent(
     role="Retriever Agent",
     goal="Fetch JSON/PDF context from knowledge base.",
@@ -16,3 +16,39 @@ SYSTEM_INSTRUCTIONS = {
     "planner": "Analyze the query + context, create structured step-by-step execution plan.",
     "developer": "Generate complete, production-grade code grounded in retrieved JSON and plan.",
 }
+
+# Micro-batching (MCP server): flush after N items or M milliseconds
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "10"))
+
+# End-to-end answer cache (keyed on KB version + normalized plan)
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_STALE_SECONDS = float(os.getenv("ANSWER_CACHE_STALE_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+KB_VERSION_CHECK_SECONDS = float(os.getenv("KB_VERSION_CHECK_SECONDS", "1"))
+# LIST answers rebuilt eagerly whenever the KB version changes
+PRECOMPUTED_LIST_TARGETS = [["commandName"], ["styles"], ["components"]]
+
+# LLM scheduler: priority classes + per-provider budgets (0 = unlimited), enforced per process
+LLM_DEFAULT_PRIORITY = os.getenv("LLM_DEFAULT_PRIORITY", "interactive")
+LLM_PRIORITY_WEIGHTS = {"interactive": 8.0, "batch": 2.0, "background": 1.0}
+LLM_RATE_LIMITS = {
+    provider: {
+        "rpm": float(os.getenv(f"LLM_RPM_{provider.upper()}", "0")),
+        "tpm": float(os.getenv(f"LLM_TPM_{provider.upper()}", "0")),
+    }
+    for provider in ("prodigy", "openai", "ollama", "stub")
+}
+
+# Per-request deadline (seconds, 0 = none) and degradation thresholds
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "90"))
+LLM_MIN_BUDGET_SECONDS = float(os.getenv("LLM_MIN_BUDGET_SECONDS", "1"))
+PLANNER_BUDGET_SHARE = float(os.getenv("PLANNER_BUDGET_SHARE", "0.4"))
+PLANNER_MIN_BUDGET_SECONDS = float(os.getenv("PLANNER_MIN_BUDGET_SECONDS", "5"))
+DEVELOPER_MIN_BUDGET_SECONDS = float(os.getenv("DEVELOPER_MIN_BUDGET_SECONDS", "5"))
+
+# On-demand profiling (X-Profile header / ?profile=1 / run_gpt.py --profile)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
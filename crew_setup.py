@@ -1,6 +1,10 @@
 # crew_setup.py
 from crewai import Crew, Task
 from agents import retriever_agent, planner_agent, developer_agent
+from config import REQUEST_DEADLINE_SECONDS
+from utils.answer_cache import answer_cache
+from utils.deadline import request_deadline
+from utils.json_index import soft_intent_heuristics
 
 # 1) Retrieval Task
 task_retrieve = Task(
@@ -34,12 +38,26 @@ crew = Crew(
     verbose=True,
 )
 
+def _kickoff(query: str) -> str:
+    result = crew.kickoff(inputs={"query": query})
+    return result.get("final_code", "❌ No final output produced")
+
 def agentic_rag_answer(query: str) -> str:
     """
     Kick off the crew pipeline:
     - Retrieve context
     - Plan intent + targets
     - Develop structured answer
+    Deterministic LIST queries are served from the answer cache without a crew run;
+    everything else is cached per (KB version, normalized plan + query).
+    Runs under REQUEST_DEADLINE_SECONDS (or a tighter outer deadline). Stages that
+    degraded to deterministic paths are recorded in the caller's request_deadline and
+    read with utils.deadline.degraded_stages() (run_gpt.py does this).
+    The deadline bounds the tools' llm_complete calls only: crewai's own agent
+    reasoning calls (agents.py) are not covered, so this path is not hard-bounded.
     """
-    result = crew.kickoff(inputs={"query": query})
-    return result.get("final_code", "❌ No final output produced")
+    plan = soft_intent_heuristics(query)
+    if plan["intent"] == "LIST" and plan["targets"]:
+        return answer_cache.list_answer(plan["targets"])
+    with request_deadline(REQUEST_DEADLINE_SECONDS, collect_degraded=False):
+        return answer_cache.get_or_compute(plan, lambda: _kickoff(query), query=query)
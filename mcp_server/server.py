@@ -1,22 +1,104 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, HTTPException, Request
 from tools.retriever_tool import retriever_tool
 from tools.planner_tool import planner_tool
 from tools.developer_tool import developer_tool
+from config import REQUEST_DEADLINE_SECONDS
+from utils.answer_cache import answer_cache, developer_key_parts
+from utils.deadline import request_deadline, degraded_stages
+from utils.llm_client import llm_complete, llm_priority, scheduler
+from utils.profiling import maybe_profile, profile_requested
+from utils.micro_batcher import (
+    get_embedding_batcher,
+    get_completion_batcher,
+    completion_batching_enabled,
+    batching_metrics,
+)
 
 app = FastAPI()
 
+@app.on_event("startup")
+def precompute_answers():
+    # rebuild common LIST answers in the background now and on every KB version change
+    answer_cache.start_precompute()
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+def _deadline_s(data: dict) -> float:
+    raw = data.get("deadline_s", REQUEST_DEADLINE_SECONDS)
+    try:
+        seconds = float(raw)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail=f"deadline_s must be a number, got {raw!r}")
+    if seconds != seconds or seconds < 0:
+        raise HTTPException(status_code=422, detail="deadline_s must be >= 0 (0 = no deadline)")
+    return seconds
+
+# Profiling: send `X-Profile: 1` or `?profile=1`; artifacts go to PROFILE_DIR and the
+# response gets a "profile" entry with their paths. Only /retrieve, /plan and /develop
+# accept it: /embed and /llm/complete run their work on batcher/worker threads.
+def _with_profile(out: dict, prof: dict) -> dict:
+    if prof:
+        out["profile"] = prof
+    return out
+
 @app.get("/retrieve")
-def retrieve(query: str):
-    return {"result": retriever_tool(query)}
+def retrieve(query: str, request: Request):
+    with maybe_profile(profile_requested(request), "retrieve") as prof:
+        out = {"result": retriever_tool(query)}
+    return _with_profile(out, prof)
 
 @app.post("/plan")
-def plan(data: dict):
-    return {"plan": planner_tool(data.get("context", ""))}
+def plan(data: dict, request: Request):
+    with maybe_profile(profile_requested(request), "plan") as prof:
+        with llm_priority("interactive"), request_deadline(_deadline_s(data)):
+            out = {"plan": planner_tool(data.get("context", "")), "degraded": degraded_stages()}
+    return _with_profile(out, prof)
 
 @app.post("/develop")
-def develop(data: dict):
-    return {"code": developer_tool(data.get("plan", ""))}
+def develop(data: dict, request: Request):
+    inputs = data.get("plan", "")
+    # `inputs` is developer_tool's {"plan", "query", "context"}; key on the plan inside it
+    plan, query, context = developer_key_parts(inputs)
+    with maybe_profile(profile_requested(request), "develop") as prof:
+        with llm_priority("interactive"), request_deadline(_deadline_s(data)):
+            code = answer_cache.get_or_compute(
+                plan, lambda: developer_tool(inputs), query=query, context=context,
+            )
+            out = {"code": code, "degraded": degraded_stages()}
+    return _with_profile(out, prof)
+
+@app.post("/embed")
+async def embed(data: dict):
+    # concurrent callers are micro-batched into one embedding call
+    return {"embedding": await get_embedding_batcher().submit(data.get("query", ""))}
+
+@app.post("/llm/complete")
+async def complete(data: dict):
+    # concurrent callers are micro-batched into one llm_complete_batch call when the
+    # provider has a batch endpoint; otherwise each call goes straight to llm_complete
+    item = {
+        "system": data.get("system", ""),
+        "prompt": data.get("prompt", ""),
+        "max_tokens": int(data.get("max_tokens", 700)),
+        "priority": data.get("priority"),
+    }
+    if not completion_batching_enabled():
+        return {"completion": await asyncio.to_thread(
+            llm_complete, item["system"], item["prompt"], item["max_tokens"], item["priority"],
+        )}
+    return {"completion": await get_completion_batcher().submit(item)}
+
+@app.get("/metrics/batching")
+def metrics_batching():
+    return batching_metrics()
+
+@app.get("/metrics/answer_cache")
+def metrics_answer_cache():
+    return answer_cache.stats()
+
+@app.get("/metrics/llm_scheduler")
+def metrics_llm_scheduler():
+    return scheduler.metrics()
@@ -1,15 +1,40 @@
 import sys
+from config import LLM_DEFAULT_PRIORITY, REQUEST_DEADLINE_SECONDS
 from crew_setup import agentic_rag_answer
+from utils.deadline import request_deadline, degraded_stages
+from utils.llm_client import PRIORITIES, llm_priority
+from utils.profiling import maybe_profile
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    # usage: python run_gpt.py [--profile] [--priority interactive|batch|background] "<query>"
+    # Nightly/batch runs should pass --priority batch. The scheduler's RPM/TPM budgets are
+    # per process, so separate run_gpt.py processes do not share the server's budget.
+    args = sys.argv[1:]
+    profile = "--profile" in args
+    priority = LLM_DEFAULT_PRIORITY
+    if "--priority" in args:
+        i = args.index("--priority")
+        priority = args[i + 1] if i + 1 < len(args) else ""
+        del args[i:i + 2]
+    args = [a for a in args if a != "--profile"]
+    if priority not in PRIORITIES:
+        print(f"❌ --priority must be one of: {', '.join(PRIORITIES)}")
+        sys.exit(1)
+    if len(args) < 1:
         print("❌ Provide a query.")
         sys.exit(1)
 
-    query = sys.argv[1]
+    query = args[0]
     print("🚀 Running Agentic RAG pipeline...\n")
-    result = agentic_rag_answer(query)
+    with maybe_profile(profile, "run_gpt") as prof:
+        with llm_priority(priority), request_deadline(REQUEST_DEADLINE_SECONDS):
+            result = agentic_rag_answer(query)
+            degraded = degraded_stages()
 
     print(f"\n✅ Final Output Type: {result['type'].upper()}")
     print("--------------------------------------------------")
     print(result["answer"])
+    if degraded:
+        print(f"\n⚠️ Degraded stages (deadline): {', '.join(degraded)}")
+    if prof:
+        print(f"\n📊 Profile written to {prof['dir']} (summary: {prof['summary']})")
@@ -1,6 +1,6 @@
 # tools/developer_tool.py
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from crewai_tools import tool
 from utils.json_index import (
     load_kb_json_objects,
@@ -8,8 +8,11 @@ from utils.json_index import (
     list_style_blocks,
     list_component_types,
     filtered_select,
+    build_list_answer,
 )
-from utils.llm_client import llm_complete
+from config import DEVELOPER_MIN_BUDGET_SECONDS
+from utils.llm_client import llm_complete, is_llm_error
+from utils.deadline import has_budget, mark_degraded
 
 DEV_SYSTEM_PROMPT = """You are a developer agent that produces accurate JSON or clear explanations.
 Rules:
@@ -24,7 +27,7 @@ def _explain_with_llm(query: str, evidence: str) -> str:
     prompt = f"Explain the following for Studio.json\n\nUser question:\n{query}\n\nRelevant evidence:\n{evidence}"
     return llm_complete(system=DEV_SYSTEM_PROMPT, prompt=prompt, max_tokens=900)
 
-def _generate_layout_with_llm(query: str, evidence: str) -> Dict[str, Any]:
+def _generate_layout_with_llm(query: str, evidence: str) -> Optional[Dict[str, Any]]:
     prompt = (
         "Generate a valid JSON layout matching the user's request. "
         "Keep keys present in the evidence when appropriate. "
@@ -32,6 +35,9 @@ def _generate_layout_with_llm(query: str, evidence: str) -> Dict[str, Any]:
         f"\nUser request:\n{query}\n\nEvidence (excerpts):\n{evidence}"
     )
     raw = llm_complete(system=DEV_SYSTEM_PROMPT, prompt=prompt, max_tokens=1200)
+    if is_llm_error(raw):
+        # deadline or provider error: caller degrades to the deterministic answer
+        return None
     # JSON repair pass:
     try:
         return json.loads(raw)
@@ -49,6 +55,13 @@ def _generate_layout_with_llm(query: str, evidence: str) -> Dict[str, Any]:
             "_llm_raw": raw[:4000]
         }
 
+def _degraded_list_answer(json_objs: List[Dict[str, Any]], targets: List[str], intent: str) -> str:
+    # Deadline / LLM-error fallback: deterministic index-based LIST output instead of an LLM answer
+    mark_degraded("developer")
+    out = build_list_answer(json_objs, targets)
+    out["degraded_from"] = intent
+    return json.dumps(out, indent=2)
+
 @tool("developer_tool")
 def developer_tool(inputs: Dict[str, Any]) -> str:
     """
@@ -97,31 +110,27 @@ def developer_tool(inputs: Dict[str, Any]) -> str:
 
     evidence_text = "\n\n".join(evidence_chunks) or context_preview
 
+    # Not enough request budget left for an LLM call -> deterministic answer
+    if intent != "LIST" and not has_budget(DEVELOPER_MIN_BUDGET_SECONDS):
+        return _degraded_list_answer(json_objs, targets, intent)
+
     # Branch by intent
     if intent == "LIST":
         # Deterministic lists from JSON
-        out = {"type": "list", "targets": targets, "results": {}}
-        if "commandName" in targets or "commands" in targets:
-            out["results"]["commandNames"] = list_unique_values_for_key(json_objs, "commandName", limit=10000)
-        if "styles" in targets:
-            out["results"]["styles"] = list_style_blocks(json_objs, limit=500)
-        if "components" in targets or "widgets" in targets:
-            out["results"]["components"] = list_component_types(json_objs, limit=10000)
-
-        # If no specific targets, try to infer from query words
-        if not out["results"]:
-            # fallback: provide commandNames as most useful
-            out["results"]["commandNames"] = list_unique_values_for_key(json_objs, "commandName", limit=10000)
-
+        out = build_list_answer(json_objs, targets)
         return json.dumps(out, indent=2)
 
     elif intent == "EXPLAIN":
         explanation = _explain_with_llm(query, evidence_text)
+        if is_llm_error(explanation):
+            return _degraded_list_answer(json_objs, targets, intent)
         # EXPLAIN returns text by default
         return explanation
 
     elif intent == "GENERATE":
         layout = _generate_layout_with_llm(query, evidence_text)
+        if layout is None:
+            return _degraded_list_answer(json_objs, targets, intent)
         # Ensure minimal shape
         if not isinstance(layout, dict) or "page" not in layout:
             layout = {
@@ -135,4 +144,6 @@ def developer_tool(inputs: Dict[str, Any]) -> str:
 
     # Unknown intent — graceful fallback
     fallback = _explain_with_llm(query, evidence_text)
+    if is_llm_error(fallback):
+        return _degraded_list_answer(json_objs, targets, intent)
     return fallback
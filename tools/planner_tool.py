@@ -3,7 +3,9 @@ import json
 import re
 from typing import Dict, Any, List
 from crewai_tools import tool
-from utils.llm_client import llm_complete
+from config import PLANNER_BUDGET_SHARE, PLANNER_MIN_BUDGET_SECONDS
+from utils.llm_client import llm_complete, is_llm_error
+from utils.deadline import has_budget, mark_degraded, stage_deadline
 from utils.json_index import (
     detect_signals_from_context,
     soft_intent_heuristics,
@@ -41,6 +43,9 @@ Do not include markdown. Return only valid JSON.
 def _llm_plan(query: str, context_preview: str) -> Dict[str, Any]:
     user = f"QUERY:\n{query}\n\nCONTEXT (preview):\n{context_preview[:4000]}"
     raw = llm_complete(system=SYSTEM_PROMPT, prompt=user, max_tokens=800)
+    if is_llm_error(raw):
+        mark_degraded("planner")
+        return {}
     try:
         return json.loads(raw)
     except Exception:
@@ -61,8 +66,14 @@ def planner_tool(inputs: Dict[str, Any]) -> str:
     heuristic = soft_intent_heuristics(query)
     detected = detect_signals_from_context(context)
 
-    # 2) LLM planning pass (robust & dynamic)
-    llm_plan = _llm_plan(query, context)
+    # 2) LLM planning pass (robust & dynamic); fall back to heuristics when the
+    #    request deadline leaves too little budget for it
+    if has_budget(PLANNER_MIN_BUDGET_SECONDS):
+        with stage_deadline(PLANNER_BUDGET_SHARE):
+            llm_plan = _llm_plan(query, context)
+    else:
+        llm_plan = {}
+        mark_degraded("planner")
 
     # 3) Merge heuristics + LLM signal
     intent = llm_plan.get("intent") or heuristic["intent"]
@@ -0,0 +1,268 @@
+# utils/answer_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from config import (
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_STALE_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES,
+    KB_VERSION_CHECK_SECONDS,
+    PRECOMPUTED_LIST_TARGETS,
+    REQUEST_DEADLINE_SECONDS,
+)
+from utils import json_index
+from utils.deadline import request_deadline, track_degraded
+from utils.llm_client import llm_priority
+from utils.profiling import profiling_active
+from utils.json_index import load_kb_json_objects, build_list_answer
+
+"""
+End-to-end answer cache in front of agentic_rag_answer and the MCP /develop endpoint.
+
+Key = KB version fingerprint (sha256 over knowledge_base/ file hashes) + normalized plan
+(intent, sorted targets, sorted constraints) + query, with the context added when
+developer_tool would use it as evidence. Only list_answer (build_list_answer, which
+depends on the KB alone) drops the query from the key.
+
+- fresh entries (< ANSWER_CACHE_TTL_SECONDS) are returned directly
+- stale entries (< TTL + ANSWER_CACHE_STALE_SECONDS) are returned and refreshed in the background
+  (LLM priority "background", own REQUEST_DEADLINE_SECONDS budget; degraded refreshes are dropped)
+- in long-lived processes (start_precompute(), called at MCP server startup) LIST answers for
+  PRECOMPUTED_LIST_TARGETS are rebuilt in the background whenever the KB version changes;
+  requests never wait on that, a miss computes just the requested targets inline
+"""
+
+# -------- KB version ----------
+_file_hashes: Dict[str, Tuple[int, int, str]] = {}  # path -> (mtime_ns, size, sha256)
+_kb_version: Optional[str] = None
+_kb_version_checked_at = 0.0
+_version_lock = threading.Lock()
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _compute_kb_version() -> str:
+    kb_dir = json_index.KB_DIR
+    h = hashlib.sha256()
+    if not os.path.isdir(kb_dir):
+        return h.hexdigest()
+    for f in sorted(os.listdir(kb_dir)):
+        path = os.path.join(kb_dir, f)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+        # only re-hash files whose mtime/size changed
+        cached = _file_hashes.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            digest = cached[2]
+        else:
+            try:
+                digest = _hash_file(path)
+            except OSError:
+                continue
+            _file_hashes[path] = (st.st_mtime_ns, st.st_size, digest)
+        h.update(f"{f}:{digest}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def kb_version(force: bool = False) -> str:
+    """
+    Fingerprint of knowledge_base/ contents; re-checked at most every KB_VERSION_CHECK_SECONDS.
+    """
+    global _kb_version, _kb_version_checked_at
+    now = time.monotonic()
+    if not force and _kb_version is not None and now - _kb_version_checked_at < KB_VERSION_CHECK_SECONDS:
+        return _kb_version
+    with _version_lock:
+        if force or _kb_version is None or now - _kb_version_checked_at >= KB_VERSION_CHECK_SECONDS:
+            _kb_version = _compute_kb_version()
+            _kb_version_checked_at = time.monotonic()
+        return _kb_version
+
+# -------- Plan normalization ----------
+def _as_plan(plan: Any) -> Dict[str, Any]:
+    if isinstance(plan, str):
+        try:
+            plan = json.loads(plan)
+        except Exception:
+            return {"query": plan}
+    return plan if isinstance(plan, dict) else {}
+
+# targets developer_tool builds KB evidence for; without one of them it uses the context preview
+_EVIDENCE_TARGETS = {"commandName", "commands", "styles", "components", "widgets"}
+
+def developer_key_parts(inputs: Any) -> Tuple[Dict[str, Any], str, str]:
+    """
+    Split developer_tool inputs ({"plan", "query", "context"}) into (plan, query, context).
+    """
+    inputs = _as_plan(inputs)
+    plan = _as_plan(inputs.get("plan") or {})
+    return plan, str(inputs.get("query") or ""), str(inputs.get("context") or "")
+
+def normalize_plan(plan: Any, query: str = "", context: str = "", deterministic: bool = False) -> Dict[str, Any]:
+    """
+    `deterministic=True` is for build_list_answer results only: the query is left out of
+    the key. Anything produced by a crew run or an LLM is always keyed on the query too.
+    """
+    plan = _as_plan(plan)
+    # exactly as developer_tool reads it (case-sensitive; "list" takes its unknown-intent branch)
+    intent = str(plan.get("intent", "EXPLAIN"))
+    norm: Dict[str, Any] = {
+        "intent": intent,
+        "targets": sorted({str(t) for t in (plan.get("targets") or [])}),
+        "constraints": sorted({str(c).strip() for c in (plan.get("constraints") or [])}),
+    }
+    if not deterministic:
+        q = query or plan.get("query") or (plan.get("_inputs") or {}).get("query", "")
+        norm["query"] = " ".join(str(q).lower().split())
+        norm["expected_output"] = plan.get("expected_output", "")
+        if context and not _EVIDENCE_TARGETS.intersection(norm["targets"]):
+            norm["context"] = hashlib.sha256(context[:2000].encode("utf-8")).hexdigest()
+    return norm
+
+def plan_key(plan: Any, query: str = "", context: str = "", deterministic: bool = False) -> str:
+    norm = normalize_plan(plan, query, context, deterministic)
+    return orjson.dumps(norm, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+
+# -------- Cache ----------
+class AnswerCache:
+    def __init__(
+        self,
+        ttl_seconds: float = 3600.0,
+        stale_seconds: float = 86400.0,
+        max_entries: int = 1024,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}  # (version, key) -> (stored_at, value)
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._precompute_enabled = False
+        self._precomputed_version: Optional[str] = None
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "precomputed": 0}
+
+    def _bump(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _store(self, ck: Tuple[str, str], value: Any) -> None:
+        with self._lock:
+            self._entries[ck] = (time.monotonic(), value)
+            # drop entries from older KB versions first, then oldest
+            if len(self._entries) > self.max_entries:
+                for k in [k for k in self._entries if k[0] != ck[0]]:
+                    del self._entries[k]
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+
+    def _revalidate(self, ck: Tuple[str, str], compute: Callable[[], Any]) -> None:
+        with self._lock:
+            if ck in self._refreshing:
+                return
+            self._refreshing.add(ck)
+
+        def run():
+            # a refresh competes with nobody: background priority, its own request budget
+            try:
+                with llm_priority("background"), request_deadline(REQUEST_DEADLINE_SECONDS):
+                    self._compute_and_store(ck, compute)
+            except Exception:
+                # keep serving the stale value
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(ck)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get_or_compute(
+        self, plan: Any, compute: Callable[[], Any], query: str = "", context: str = "",
+        deterministic: bool = False,
+    ) -> Any:
+        version = kb_version()
+        # profiled requests keep all work on their own thread (cProfile sees only that one)
+        profiling = profiling_active()
+        if not profiling:
+            self._maybe_precompute(version)
+        ck = (version, plan_key(plan, query, context, deterministic))
+
+        with self._lock:
+            entry = self._entries.get(ck)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                self._bump("hits")
+                return entry[1]
+            if age < self.ttl_seconds + self.stale_seconds and not profiling:
+                self._bump("stale_hits")
+                self._revalidate(ck, compute)
+                return entry[1]
+
+        self._bump("misses")
+        return self._compute_and_store(ck, compute)
+
+    def _compute_and_store(self, ck: Tuple[str, str], compute: Callable[[], Any]) -> Any:
+        with track_degraded() as degraded:
+            value = compute()
+        # never cache an answer that hit the deadline or an LLM error (llm_complete marks both)
+        if not degraded:
+            self._store(ck, value)
+        return value
+
+    def list_answer(self, targets: List[str]) -> str:
+        """
+        Deterministic LIST answer (same JSON string developer_tool returns).
+        """
+        def compute() -> str:
+            return json.dumps(build_list_answer(load_kb_json_objects(), list(targets)), indent=2)
+        return self.get_or_compute({"intent": "LIST", "targets": targets}, compute, deterministic=True)
+
+    # -------- Precompute ----------
+    def start_precompute(self) -> None:
+        """
+        Enable background LIST precompute (long-lived processes only) and run it for the
+        current KB version; later version changes are picked up by get_or_compute.
+        """
+        self._precompute_enabled = True
+        self._maybe_precompute(kb_version())
+
+    def _maybe_precompute(self, version: str) -> None:
+        if not self._precompute_enabled or self._precomputed_version == version:
+            return
+        with self._lock:
+            if self._precomputed_version == version:
+                return
+            self._precomputed_version = version
+        threading.Thread(target=self.precompute_lists, args=(version,), daemon=True).start()
+
+    def precompute_lists(self, version: Optional[str] = None) -> None:
+        version = version or kb_version()
+        objs = load_kb_json_objects()
+        for targets in PRECOMPUTED_LIST_TARGETS:
+            ck = (version, plan_key({"intent": "LIST", "targets": targets}, deterministic=True))
+            self._store(ck, json.dumps(build_list_answer(objs, list(targets)), indent=2))
+            self._bump("precomputed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), kb_version=_kb_version)
+
+answer_cache = AnswerCache(
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    stale_seconds=ANSWER_CACHE_STALE_SECONDS,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,99 @@
+# utils/deadline.py
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+"""
+Per-request deadline carried in a context variable.
+
+Usage:
+    with request_deadline(30):
+        ...                                   # planner_tool / developer_tool / llm_complete
+        with stage_deadline(0.5):             # this stage may use half of what is left
+            llm_complete(...)                 # HTTP timeout = remaining()
+        degraded_stages()                     # e.g. ["planner"] if it fell back to heuristics
+
+Without an active deadline remaining() is None and every stage runs unbounded (old behaviour).
+"""
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+_degraded: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("degraded_stages", default=None)
+
+@contextmanager
+def request_deadline(seconds: Optional[float], collect_degraded: bool = True) -> Iterator[None]:
+    """
+    Start a request budget (never extends an outer deadline) and collect degraded stages.
+    Library code should pass collect_degraded=False: the stages then land in the caller's
+    list (if it opened one) instead of a private list that is dropped on exit.
+    """
+    new = None if seconds is None or seconds <= 0 else time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        new = outer if new is None else min(outer, new)
+    d_token = _deadline.set(new)
+    g_token = _degraded.set([]) if collect_degraded and _degraded.get() is None else None
+    try:
+        yield
+    finally:
+        _deadline.reset(d_token)
+        if g_token is not None:
+            _degraded.reset(g_token)
+
+@contextmanager
+def stage_deadline(share: float) -> Iterator[None]:
+    """
+    Narrow the deadline to `share` of the remaining budget for one stage.
+    """
+    left = remaining()
+    if left is None:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + max(0.0, left) * share)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    d = _deadline.get()
+    return None if d is None else d - time.monotonic()
+
+def has_budget(min_seconds: float) -> bool:
+    left = remaining()
+    return left is None or left >= min_seconds
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+def bounded_timeout(default: float) -> float:
+    """
+    Provider timeout: the usual fixed timeout, capped by the remaining budget.
+    """
+    left = remaining()
+    return default if left is None else max(0.0, min(default, left))
+
+@contextmanager
+def track_degraded() -> Iterator[List[str]]:
+    """
+    Collect the stages degraded inside this block (even with no request_deadline active);
+    they are also merged into the enclosing request's list on exit.
+    """
+    outer = _degraded.get()
+    stages: List[str] = []
+    token = _degraded.set(stages)
+    try:
+        yield stages
+    finally:
+        _degraded.reset(token)
+        if outer is not None:
+            outer.extend(s for s in stages if s not in outer)
+
+def mark_degraded(stage: str) -> None:
+    stages = _degraded.get()
+    if stages is not None and stage not in stages:
+        stages.append(stage)
+
+def degraded_stages() -> List[str]:
+    return list(_degraded.get() or [])
@@ -131,3 +131,21 @@ def filtered_select(objs: List[Dict[str, Any]], constraints: List[str]) -> List[
             if len(hits) >= 25:
                 break
     return hits
+
+def build_list_answer(objs: List[Dict[str, Any]], targets: List[str]) -> Dict[str, Any]:
+    """
+    Deterministic LIST answer for the given targets (used by developer_tool and the answer cache).
+    """
+    out: Dict[str, Any] = {"type": "list", "targets": targets, "results": {}}
+    if "commandName" in targets or "commands" in targets:
+        out["results"]["commandNames"] = list_unique_values_for_key(objs, "commandName", limit=10000)
+    if "styles" in targets:
+        out["results"]["styles"] = list_style_blocks(objs, limit=500)
+    if "components" in targets or "widgets" in targets:
+        out["results"]["components"] = list_component_types(objs, limit=10000)
+
+    # If no specific targets, try to infer from query words
+    if not out["results"]:
+        # fallback: provide commandNames as most useful
+        out["results"]["commandNames"] = list_unique_values_for_key(objs, "commandName", limit=10000)
+    return out
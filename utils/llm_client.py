@@ -1,24 +1,247 @@
 # utils/llm_client.py
 import os
+import re
 import json
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 import requests
 
+from config import LLM_DEFAULT_PRIORITY, LLM_PRIORITY_WEIGHTS, LLM_RATE_LIMITS, LLM_MIN_BUDGET_SECONDS
+from utils.deadline import bounded_timeout, has_budget, mark_degraded, remaining
+
 """
 Unified LLM client for:
 - Prodigy ADK MCP server (HTTP) -> set LLM_PROVIDER=prodigy and PRODIGY_ENDPOINT=http://localhost:8000/complete
 - OpenAI -> set LLM_PROVIDER=openai and OPENAI_API_KEY=...
 - Ollama (local) -> set LLM_PROVIDER=ollama and OLLAMA_MODEL=llama3.1 (or similar)
+- Stub (local testing) -> set LLM_PROVIDER=stub (optional STUB_LATENCY_MS=...)
+
+Usage: llm_complete(system, prompt, max_tokens, priority=None)
+
+Every completion goes through `scheduler`:
+- priority classes "interactive" | "batch" | "background", from the `priority=` argument
+  or the `llm_priority(...)` context manager (default LLM_DEFAULT_PRIORITY)
+- weighted fair queuing across classes (LLM_PRIORITY_WEIGHTS), so batch work cannot
+  starve interactive calls and is itself never starved completely
+- per-provider request-per-minute / token-per-minute budgets (LLM_RATE_LIMITS, 0 = unlimited)
+- scheduler.metrics() exposes queue depth and wait times per class
 
-Usage: llm_complete(system, prompt, max_tokens)
+The scheduler and its budgets are per process: separate processes (e.g. nightly
+`run_gpt.py --priority batch` jobs) each get a full budget and do not queue behind the
+MCP server. To share one budget, send batch work through the server's /llm/complete
+with "priority": "batch", or set LLM_RPM_*/LLM_TPM_* to each process's share.
+Completions made by crewai agents themselves (agents.py, LLM_MODEL) do not go through
+llm_complete and are not scheduled.
+
+Timeouts are capped by the active request deadline (utils/deadline.py); once the budget
+is spent llm_complete returns LLM_DEADLINE_ERROR without calling the provider. Deadline
+and provider errors ("LLM..._ERROR: ...", see is_llm_error) mark the "llm" stage degraded,
+which keeps them out of the answer cache.
 """
 
+PRIORITIES = ("interactive", "batch", "background")
+
+LLM_DEADLINE_ERROR = "LLM_ERROR: request deadline exceeded"
+
+_LLM_ERROR_RE = re.compile(r"^LLM(\([A-Z]+\))?_ERROR:")
+
+def is_llm_error(text: Any) -> bool:
+    return isinstance(text, str) and bool(_LLM_ERROR_RE.match(text))
+
+_priority_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_priority", default=None)
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """
+    with llm_priority("batch"):
+        ...  # every llm_complete in here is scheduled as batch
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    token = _priority_var.set(priority)
+    try:
+        yield
+    finally:
+        _priority_var.reset(token)
+
+def current_priority(priority: Optional[str] = None) -> str:
+    p = priority or _priority_var.get() or LLM_DEFAULT_PRIORITY
+    return p if p in PRIORITIES else "interactive"
+
+def estimate_tokens(system: str, prompt: str, max_tokens: int) -> int:
+    # ~4 chars per token for the input, plus the full output allowance
+    return (len(system or "") + len(prompt or "")) // 4 + int(max_tokens or 0)
+
+# -------- Scheduler ----------
+class _Bucket:
+    """
+    Token bucket refilled continuously at `per_minute / 60` per second (0 = unlimited).
+    """
+    def __init__(self, per_minute: float):
+        self.per_minute = float(per_minute or 0)
+        self.level = self.per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.per_minute > 0:
+            self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill(now)
+        # a single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.per_minute
+
+    def take(self, amount: float, now: float) -> None:
+        if self.per_minute > 0:
+            self._refill(now)
+            self.level -= min(amount, self.per_minute)
+
+class LLMScheduler:
+    def __init__(
+        self,
+        rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.rate_limits = rate_limits or {}
+        self.weights = weights or {"interactive": 8.0, "batch": 2.0, "background": 1.0}
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, Dict[str, _Bucket]] = {}
+        self._queues: Dict[str, list] = {}  # provider -> heap of (finish_tag, seq, priority, start_tag)
+        self._last_finish: Dict[tuple, float] = {}  # (provider, priority) -> last virtual finish tag
+        self._virtual_time: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._metrics = {
+            p: {"queued": 0, "completed": 0, "timed_out": 0, "wait_s_total": 0.0, "wait_s_max": 0.0}
+            for p in PRIORITIES
+        }
+
+    def _provider_buckets(self, provider: str) -> Dict[str, _Bucket]:
+        if provider not in self._buckets:
+            limits = self.rate_limits.get(provider, {})
+            self._buckets[provider] = {
+                "rpm": _Bucket(limits.get("rpm", 0)),
+                "tpm": _Bucket(limits.get("tpm", 0)),
+            }
+        return self._buckets[provider]
+
+    def acquire(
+        self, provider: str, priority: str, tokens: int,
+        timeout: Optional[float] = None, n_requests: int = 1,
+    ) -> float:
+        """
+        Block until this request is first in the fair queue and the provider budgets allow it.
+        `n_requests` is charged against RPM (a batched call carries several completions).
+        Returns the time spent waiting (seconds); raises TimeoutError after `timeout` seconds.
+        """
+        enqueued = time.monotonic()
+        give_up = None if timeout is None else enqueued + timeout
+        with self._cond:
+            # weighted fair queuing: virtual finish tag = start + cost / weight
+            vt = self._virtual_time.get(provider, 0.0)
+            start = max(vt, self._last_finish.get((provider, priority), 0.0))
+            finish = start + max(1, tokens) / self.weights.get(priority, 1.0)
+            self._last_finish[(provider, priority)] = finish
+            entry = (finish, next(self._seq), priority, start)
+            heap = self._queues.setdefault(provider, [])
+            heapq.heappush(heap, entry)
+            self._metrics[priority]["queued"] += 1
+
+            buckets = self._provider_buckets(provider)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = None
+                    if heap[0] is entry:
+                        delay = max(buckets["rpm"].wait_time(n_requests, now), buckets["tpm"].wait_time(tokens, now))
+                        if delay <= 0:
+                            break
+                    if give_up is not None:
+                        if now >= give_up:
+                            self._metrics[priority]["timed_out"] += 1
+                            raise TimeoutError("LLM scheduler: request deadline reached while queued")
+                        delay = give_up - now if delay is None else min(delay, give_up - now)
+                    self._cond.wait(timeout=delay)
+                buckets["rpm"].take(n_requests, now)
+                buckets["tpm"].take(tokens, now)
+                # virtual clock advances to the start tag of the request being served
+                self._virtual_time[provider] = max(self._virtual_time.get(provider, 0.0), start)
+            finally:
+                heap.remove(entry)
+                heapq.heapify(heap)
+                self._metrics[priority]["queued"] -= 1
+                self._cond.notify_all()
+
+            waited = time.monotonic() - enqueued
+            m = self._metrics[priority]
+            m["completed"] += 1
+            m["wait_s_total"] += waited
+            m["wait_s_max"] = max(m["wait_s_max"], waited)
+            return waited
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            out: Dict[str, Any] = {}
+            for p, m in self._metrics.items():
+                out[p] = dict(
+                    m,
+                    queue_depth=m["queued"],
+                    avg_wait_s=m["wait_s_total"] / m["completed"] if m["completed"] else 0.0,
+                )
+            return out
+
+scheduler = LLMScheduler(rate_limits=LLM_RATE_LIMITS, weights=LLM_PRIORITY_WEIGHTS)
+
 def _post_json(url: str, payload: dict, headers: dict = None, timeout: int = 60) -> str:
     r = requests.post(url, json=payload, headers=headers or {}, timeout=timeout)
     r.raise_for_status()
     return r.text
 
-def llm_complete(system: str, prompt: str, max_tokens: int = 700) -> str:
-    provider = (os.getenv("LLM_PROVIDER") or "prodigy").lower()
+def _provider() -> str:
+    return (os.getenv("LLM_PROVIDER") or "prodigy").lower()
+
+def llm_complete(system: str, prompt: str, max_tokens: int = 700, priority: Optional[str] = None) -> str:
+    provider = _provider()
+    # respect the request deadline (utils/deadline.py) both in the queue and on the wire
+    if not has_budget(LLM_MIN_BUDGET_SECONDS):
+        return _deadline_error()
+    try:
+        scheduler.acquire(
+            provider, current_priority(priority), estimate_tokens(system, prompt, max_tokens),
+            timeout=remaining(),
+        )
+    except TimeoutError:
+        return _deadline_error()
+    if not has_budget(LLM_MIN_BUDGET_SECONDS):
+        return _deadline_error()
+    return _provider_complete(provider, system, prompt, max_tokens)
+
+def _deadline_error() -> str:
+    return _llm_error(LLM_DEADLINE_ERROR)
+
+def _llm_error(text: str) -> str:
+    # recorded here too, so a caller that misses the error string still never gets cached
+    mark_degraded("llm")
+    return text
+
+def _provider_complete(provider: str, system: str, prompt: str, max_tokens: int) -> str:
+    if provider == "stub":
+        # deterministic local provider for tests / scheduler experiments
+        latency_ms = float(os.getenv("STUB_LATENCY_MS", "0"))
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000.0)
+        return f"STUB_COMPLETION: {prompt[:200]}"
 
     if provider == "prodigy":
         # Expect your MCP/ADK HTTP bridge to accept:
@@ -28,7 +251,7 @@ def llm_complete(system: str, prompt: str, max_tokens: int = 700) -> str:
             resp = requests.post(
                 endpoint,
                 json={"system": system, "prompt": prompt, "max_tokens": max_tokens},
-                timeout=120,
+                timeout=bounded_timeout(120),
             )
             resp.raise_for_status()
             data = resp.json()
@@ -38,7 +261,7 @@ def llm_complete(system: str, prompt: str, max_tokens: int = 700) -> str:
             # fallbacks
             return data if isinstance(data, str) else json.dumps(data)
         except Exception as e:
-            return f"LLM(PRODIGY)_ERROR: {e}"
+            return _llm_error(f"LLM(PRODIGY)_ERROR: {e}")
 
     if provider == "openai":
         # Minimal OpenAI REST call (completions style) – adjust to your SDK if needed.
@@ -54,10 +277,11 @@ def llm_complete(system: str, prompt: str, max_tokens: int = 700) -> str:
                 ],
                 max_tokens=max_tokens,
                 temperature=0.1,
+                timeout=bounded_timeout(120),
             )
             return resp.choices[0].message.content
         except Exception as e:
-            return f"LLM(OPENAI)_ERROR: {e}"
+            return _llm_error(f"LLM(OPENAI)_ERROR: {e}")
 
     if provider == "ollama":
         # Simple Ollama REST call
@@ -73,10 +297,79 @@ def llm_complete(system: str, prompt: str, max_tokens: int = 700) -> str:
                 "stream": False,
                 "options": {"num_predict": max_tokens, "temperature": 0.1},
             }
-            txt = _post_json(url, payload)
+            txt = _post_json(url, payload, timeout=bounded_timeout(60))
             data = json.loads(txt)
             return data.get("message", {}).get("content", txt)
         except Exception as e:
-            return f"LLM(OLLAMA)_ERROR: {e}"
+            return _llm_error(f"LLM(OLLAMA)_ERROR: {e}")
+
+    return _llm_error("LLM_ERROR: Unknown provider")
+
+def llm_complete_batch(items: List[Dict[str, Any]]) -> List[str]:
+    """
+    Batched completions: items are {"system", "prompt", "max_tokens", "priority"?}.
+    For prodigy, if PRODIGY_BATCH_ENDPOINT is set, sends ONE request:
+      { "requests": [{ "system": ..., "prompt": ..., "max_tokens": ... }, ...] }
+    and expects { "completions": ["...", ...] }. Otherwise falls back to one
+    llm_complete per item, run concurrently.
+    """
+    provider = _provider()
+    batch_endpoint = os.getenv("PRODIGY_BATCH_ENDPOINT")
+
+    if provider == "prodigy" and batch_endpoint and items:
+        # one scheduled request at the most urgent priority in the batch
+        priority = min(
+            (current_priority(it.get("priority")) for it in items),
+            key=PRIORITIES.index,
+        )
+        tokens = sum(
+            estimate_tokens(it.get("system", ""), it.get("prompt", ""), it.get("max_tokens", 700))
+            for it in items
+        )
+        try:
+            scheduler.acquire(provider, priority, tokens, timeout=remaining(), n_requests=len(items))
+        except TimeoutError:
+            return [_deadline_error()] * len(items)
+        try:
+            resp = requests.post(
+                batch_endpoint,
+                json={"requests": [
+                    {
+                        "system": it.get("system", ""),
+                        "prompt": it.get("prompt", ""),
+                        "max_tokens": it.get("max_tokens", 700),
+                    }
+                    for it in items
+                ]},
+                timeout=bounded_timeout(120),
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            completions = data.get("completions") if isinstance(data, dict) else None
+            if isinstance(completions, list) and len(completions) == len(items):
+                return [c if isinstance(c, str) else json.dumps(c) for c in completions]
+        except Exception:
+            # fall through to per-item calls
+            pass
+
+        # the batch was already charged against the budget: call the provider directly
+        def charged(it: Dict[str, Any]) -> str:
+            if not has_budget(LLM_MIN_BUDGET_SECONDS):
+                return _deadline_error()
+            return _provider_complete(provider, it.get("system", ""), it.get("prompt", ""), it.get("max_tokens", 700))
+        return _map_concurrently(charged, items)
+
+    def one(it: Dict[str, Any]) -> str:
+        return llm_complete(
+            it.get("system", ""), it.get("prompt", ""), it.get("max_tokens", 700),
+            priority=it.get("priority"),
+        )
+    return _map_concurrently(one, items)
 
-    return "LLM_ERROR: Unknown provider"
+def _map_concurrently(fn, items: List[Dict[str, Any]]) -> List[str]:
+    if not items:
+        return []
+    # each worker runs in a copy of the caller's context (deadline, priority)
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, it) for it in items]
+        return [f.result() for f in futures]
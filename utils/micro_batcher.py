@@ -0,0 +1,194 @@
+# utils/micro_batcher.py
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    EMBEDDING_MODEL,
+    EMBED_BATCH_MAX_SIZE,
+    EMBED_BATCH_MAX_WAIT_MS,
+    LLM_BATCH_MAX_SIZE,
+    LLM_BATCH_MAX_WAIT_MS,
+)
+
+"""
+Dynamic micro-batching for concurrent callers (MCP server).
+
+Concurrent `submit(item)` calls are collected for up to `max_batch_size` items
+or `max_wait_ms` milliseconds (whichever comes first), dispatched as ONE call to
+`batch_fn(items) -> results` (run in a worker thread, so blocking clients are fine)
+and the results are scattered back to the waiting callers in order.
+
+Usage:
+    batcher = get_embedding_batcher()
+    vec = await batcher.submit("list all commandNames")
+
+Only the MCP /embed and /llm/complete endpoints use these batchers; nothing in the
+crew/retrieval path calls them (the retriever does no query embedding today).
+"""
+
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._metrics: Dict[str, float] = {
+            "batches": 0,
+            "items": 0,
+            "errors": 0,
+            "queue_delay_ms_total": 0.0,
+            "queue_delay_ms_max": 0.0,
+        }
+
+    # -------- Public API ----------
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut, time.perf_counter()))
+        return await fut
+
+    def metrics(self) -> Dict[str, Any]:
+        m = dict(self._metrics)
+        batches = m["batches"] or 1
+        items = m["items"] or 1
+        m["name"] = self.name
+        m["max_batch_size"] = self.max_batch_size
+        m["max_wait_ms"] = self.max_wait_ms
+        m["avg_batch_size"] = m["items"] / batches
+        m["avg_batch_fill"] = m["items"] / (batches * self.max_batch_size)
+        m["avg_queue_delay_ms"] = m["queue_delay_ms_total"] / items
+        m["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        return m
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._queue = None
+
+    # -------- Internals ----------
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            dispatched_at = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                delay_ms = (dispatched_at - enqueued_at) * 1000.0
+                self._metrics["queue_delay_ms_total"] += delay_ms
+                self._metrics["queue_delay_ms_max"] = max(self._metrics["queue_delay_ms_max"], delay_ms)
+            self._metrics["batches"] += 1
+            self._metrics["items"] += len(batch)
+            # dispatch without waiting, so the next batch is collected while this one runs
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        items = [item for item, _, _ in batch]
+        try:
+            results = await asyncio.to_thread(self.batch_fn, items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            self._metrics["errors"] += 1
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut, _), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+# -------- Shared batchers ----------
+_embedding_batcher: Optional[MicroBatcher] = None
+_completion_batcher: Optional[MicroBatcher] = None
+
+_embeddings_client = None
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    # one client for the process (a rare duplicate construction across worker threads is harmless)
+    global _embeddings_client
+    if _embeddings_client is None:
+        from langchain_ollama import OllamaEmbeddings
+        _embeddings_client = OllamaEmbeddings(model=EMBEDDING_MODEL)
+    return _embeddings_client.embed_documents(texts)
+
+def _complete_batch(items: List[Dict[str, Any]]) -> List[str]:
+    from utils.llm_client import llm_complete_batch
+    return llm_complete_batch(items)
+
+def get_embedding_batcher() -> MicroBatcher:
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = MicroBatcher(
+            _embed_batch,
+            max_batch_size=EMBED_BATCH_MAX_SIZE,
+            max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+            name="embeddings",
+        )
+    return _embedding_batcher
+
+def completion_batching_enabled() -> bool:
+    """
+    Completions are only worth batching when the provider takes a whole batch in one
+    request (prodigy + PRODIGY_BATCH_ENDPOINT); otherwise callers use llm_complete directly.
+    """
+    provider = (os.getenv("LLM_PROVIDER") or "prodigy").lower()
+    return provider == "prodigy" and bool(os.getenv("PRODIGY_BATCH_ENDPOINT"))
+
+def get_completion_batcher() -> MicroBatcher:
+    """
+    Items are {"system": str, "prompt": str, "max_tokens": int, "priority": str|None}.
+    """
+    global _completion_batcher
+    if _completion_batcher is None:
+        _completion_batcher = MicroBatcher(
+            _complete_batch,
+            max_batch_size=LLM_BATCH_MAX_SIZE,
+            max_wait_ms=LLM_BATCH_MAX_WAIT_MS,
+            name="completions",
+        )
+    return _completion_batcher
+
+def batching_metrics() -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for b in (_embedding_batcher, _completion_batcher):
+        if b is not None:
+            out[b.name] = b.metrics()
+    return out
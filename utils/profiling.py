@@ -0,0 +1,120 @@
+# utils/profiling.py
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional
+
+from config import PROFILE_DIR, PROFILE_TOP_N
+
+"""
+Opt-in, per-request profiling (cProfile + tracemalloc).
+
+    with profile_request("develop") as info:
+        ...                      # the request's work (same thread)
+    info["summary"]              # path to the text summary
+
+Artifacts in PROFILE_DIR/<timestamp>_<name>/:
+- profile.prof   -> load with `python -m pstats` or snakeviz
+- summary.txt    -> top functions (cumulative + own time), json_index / llm_client
+                    focus, top allocation sites
+
+When profiling is not requested callers use `maybe_profile(False, ...)`, which is a
+plain nullcontext: no profiler and no tracemalloc hooks are installed.
+
+cProfile only sees the calling thread. While profiling_active() is True the answer cache
+does its work inline (stale entries are recomputed in the request, KB-version precompute
+is not started), so extraction and LLM waits show up in the profile. Work on other
+threads is still invisible: the micro-batcher behind /embed and /llm/complete (those
+endpoints do not take the profile flag) and any threads crewai runs tools on.
+"""
+
+_FOCUS = r"json_index|_walk|orjson|load_kb_json_objects|llm_client|requests"
+
+_active: contextvars.ContextVar[bool] = contextvars.ContextVar("profiling_active", default=False)
+
+def profiling_active() -> bool:
+    return _active.get()
+
+def _summary(prof: Optional[cProfile.Profile], snapshot: Optional[tracemalloc.Snapshot], elapsed: float, name: str) -> str:
+    out = io.StringIO()
+    out.write(f"profile: {name}\nwall time: {elapsed:.3f}s\n\n")
+
+    sections = [
+        ("TOP FUNCTIONS (cumulative)", "cumulative", PROFILE_TOP_N),
+        ("TOP FUNCTIONS (own time)", "tottime", PROFILE_TOP_N),
+        ("FOCUS: extraction / JSON loading / LLM waits", "cumulative", _FOCUS),
+    ] if prof is not None else []
+    for title, sort_key, restrict in sections:
+        out.write(f"==== {title} ====\n")
+        stats = pstats.Stats(prof, stream=out).strip_dirs().sort_stats(sort_key)
+        if isinstance(restrict, str):
+            stats.print_stats(restrict, PROFILE_TOP_N)
+        else:
+            stats.print_stats(restrict)
+
+    if snapshot is not None:
+        out.write("==== TOP ALLOCATION SITES ====\n")
+        stats = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        )).statistics("lineno")
+        for stat in stats[:PROFILE_TOP_N]:
+            out.write(f"{stat}\n")
+    return out.getvalue()
+
+@contextmanager
+def profile_request(name: str) -> Iterator[Dict[str, Any]]:
+    """
+    Profile the enclosed block (current thread only) and write artifacts to PROFILE_DIR.
+    """
+    run_dir = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}_{name}")
+    info: Dict[str, Any] = {"dir": run_dir}
+
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(25)
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+        profiling = True
+    except ValueError:
+        # another profiler is active (e.g. a concurrent profiled request on 3.12+)
+        profiling = False
+        info["error"] = "cProfile unavailable: another profiler is active"
+    active_token = _active.set(True)
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        _active.reset(active_token)
+        if profiling:
+            prof.disable()
+        elapsed = time.perf_counter() - t0
+        # a concurrent profiled request may already have stopped tracemalloc
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(run_dir, exist_ok=True)
+        if profiling:
+            prof.dump_stats(os.path.join(run_dir, "profile.prof"))
+        summary_path = os.path.join(run_dir, "summary.txt")
+        with open(summary_path, "w", encoding="utf-8") as fh:
+            fh.write(_summary(prof if profiling else None, snapshot, elapsed, name))
+        info["summary"] = summary_path
+        info["wall_s"] = round(elapsed, 4)
+
+def maybe_profile(enabled: bool, name: str):
+    return profile_request(name) if enabled else nullcontext({})
+
+def profile_requested(request: Any) -> bool:
+    """
+    FastAPI: `X-Profile: 1` header or `?profile=1` query flag.
+    """
+    flag = request.headers.get("x-profile") or request.query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes", "on")